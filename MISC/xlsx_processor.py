@@ -7,11 +7,16 @@ Process an Excel file:
 
 Requirements:
     pip install pandas geopy openpyxl tqdm pyarrow   # or fastparquet instead of pyarrow
+    pip install pyahocorasick                        # optional, faster recategorization
 """
 
+import json
 import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from tqdm import tqdm  # ✅ Progress bar
 
@@ -23,24 +28,180 @@ ADDRESS_COL = "Address"              # Column with addresses to geocode
 CATEGORY_COL = "Cateogry of Help"    # Column to be recategorized
 
 OUTPUT_PATH = INPUT_PATH.with_name(INPUT_PATH.stem + "_geocoded.xlsx")
+CACHE_DB_PATH = INPUT_PATH.with_name(INPUT_PATH.stem + "_geocache.sqlite")
+# Legacy parquet cache from earlier runs; imported into sqlite once if found.
 CACHE_PATH = INPUT_PATH.with_name(INPUT_PATH.stem + "_geocache.parquet")
 
 # Switches to turn processing on/off
 RUN_GEOCODING = True
 RUN_RECAT = True
 
-# Geocoding provider
+# Threads overlapping geocoder round-trips; RateLimiter still paces
+# outbound requests globally, so this does not exceed Nominatim's policy.
+GEOCODE_WORKERS = 8
+
+# Geocoding provider: "nominatim" (default, 1 req/s policy), "google"
+# (needs `pip install googlemaps` and an API key; much higher throughput),
+# or "pelias" (self-hosted instance, no rate limit).
+GEOCODER = "nominatim"
+GOOGLE_API_KEY = ""    # required for GEOCODER = "google"
+GOOGLE_WORKERS = 50    # sized to Google's 50 req/s limit
+PELIAS_URL = "http://localhost:4000/v1/search"
+PELIAS_WORKERS = 16
+
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 
 
 # ----------------- Geocoding ----------------- #
 
+_WS = re.compile(r"\s+")
+
+
 def norm_addr(s):
     """Normalize address string."""
     if pd.isna(s):
         return ""
-    return re.sub(r"\s+", " ", str(s).strip())
+    return _WS.sub(" ", str(s).strip())
+
+
+def _open_cache_db() -> sqlite3.Connection:
+    """Open (and if needed create) the sqlite geocache, importing any legacy parquet/CSV cache."""
+    conn = sqlite3.connect(CACHE_DB_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS geocache (query TEXT PRIMARY KEY, lat REAL, lng REAL)"
+    )
+    empty = conn.execute("SELECT 1 FROM geocache LIMIT 1").fetchone() is None
+    if empty:
+        # The old writer tried parquet but fell back to CSV when pyarrow was
+        # missing, so the caches actually on disk are usually the CSVs.
+        csv_path = CACHE_PATH.with_suffix(".csv")
+        legacy_path = CACHE_PATH if CACHE_PATH.exists() else csv_path
+        if legacy_path.exists():
+            try:
+                if legacy_path.suffix == ".parquet":
+                    legacy = pd.read_parquet(legacy_path)
+                else:
+                    legacy = pd.read_csv(legacy_path)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO geocache (query, lat, lng) VALUES (?, ?, ?)",
+                    legacy[["query", "lat", "lng"]].itertuples(index=False),
+                )
+                conn.commit()
+                print(f"✅ Imported {len(legacy)} legacy cache entries from {legacy_path.name}")
+            except Exception as e:
+                print(f"⚠️ Could not import legacy cache from {legacy_path.name} ({e}).")
+    return conn
+
+
+def _load_cache_entries(conn: sqlite3.Connection, queries) -> dict:
+    """Point-lookup only the given queries; returns {query: (lat, lng)}."""
+    out = {}
+    queries = list(queries)
+    for i in range(0, len(queries), 500):
+        chunk = queries[i : i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT query, lat, lng FROM geocache WHERE query IN ({placeholders})",
+            chunk,
+        )
+        for query, lat, lng in rows:
+            out[query] = (lat, lng)
+    return out
+
+
+def _resolve_pooled(need, one, workers, flush=None, flush_every=50) -> dict:
+    """
+    Run `one(addr) -> (lat, lng) | None` over a thread pool; failures are skipped.
+
+    If `flush` is given, completed (query, lat, lng) rows are handed to it in
+    batches as the run progresses, so an interrupted run keeps its results.
+    """
+    results = {}
+    pending = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(one, addr): addr for addr in need}
+        for fut in tqdm(
+            as_completed(futures),
+            total=len(futures),
+            desc="Geocoding",
+            ncols=100,
+            mininterval=1.0,
+        ):
+            try:
+                loc = fut.result()
+            except Exception:
+                loc = None
+            if loc:
+                results[futures[fut]] = loc
+                if flush is not None:
+                    pending.append((futures[fut], loc[0], loc[1]))
+                    if len(pending) >= flush_every:
+                        flush(pending)
+                        pending.clear()
+    if flush is not None and pending:
+        flush(pending)
+    return results
+
+
+def _geocode_nominatim(need, flush=None) -> dict:
+    """Resolve addresses via Nominatim, paced to its 1 req/s policy."""
+    geolocator = Nominatim(user_agent="chatgpt_geocode_script", timeout=10)
+    geocode = RateLimiter(
+        geolocator.geocode,
+        min_delay_seconds=1.2,
+        max_retries=3,
+        swallow_exceptions=True,
+    )
+
+    def one(addr):
+        loc = geocode(addr)
+        return (loc.latitude, loc.longitude) if loc else None
+
+    return _resolve_pooled(need, one, GEOCODE_WORKERS, flush=flush)
+
+
+def _geocode_google(need, flush=None) -> dict:
+    """Resolve addresses via the Google Geocoding API (much higher rate limit)."""
+    import googlemaps  # pip install googlemaps
+
+    client = googlemaps.Client(key=GOOGLE_API_KEY)
+
+    def one(addr):
+        hits = client.geocode(addr)
+        if hits:
+            loc = hits[0]["geometry"]["location"]
+            return loc["lat"], loc["lng"]
+        return None
+
+    return _resolve_pooled(need, one, GOOGLE_WORKERS, flush=flush)
+
+
+def _geocode_pelias(need, flush=None) -> dict:
+    """Resolve addresses via a self-hosted Pelias /v1/search endpoint."""
+    from urllib.parse import urlencode
+    from urllib.request import urlopen
+
+    def one(addr):
+        url = f"{PELIAS_URL}?{urlencode({'text': addr, 'size': 1})}"
+        with urlopen(url, timeout=10) as resp:
+            payload = json.load(resp)
+        features = payload.get("features") or []
+        if features:
+            lng, lat = features[0]["geometry"]["coordinates"]
+            return lat, lng
+        return None
+
+    return _resolve_pooled(need, one, PELIAS_WORKERS, flush=flush)
+
+
+def _resolve_addresses(need, flush=None) -> dict:
+    """Resolve addresses to (lat, lng) with the provider selected by GEOCODER."""
+    if GEOCODER == "google":
+        return _geocode_google(need, flush=flush)
+    if GEOCODER == "pelias":
+        return _geocode_pelias(need, flush=flush)
+    return _geocode_nominatim(need, flush=flush)
 
 
 def geocode_addresses(df: pd.DataFrame) -> pd.DataFrame:
@@ -52,69 +213,55 @@ def geocode_addresses(df: pd.DataFrame) -> pd.DataFrame:
     df["Latitude"] = df.get("Latitude", pd.NA)
     df["Longitude"] = df.get("Longitude", pd.NA)
 
-    # Load cache if available
-    if CACHE_PATH.exists():
-        try:
-            cache = pd.read_parquet(CACHE_PATH)
-        except Exception:
-            cache = pd.DataFrame(columns=["query", "lat", "lng"])
-    else:
-        cache = pd.DataFrame(columns=["query", "lat", "lng"])
-
-    cache_map = dict(zip(cache["query"], cache[["lat", "lng"]].to_records(index=False)))
-
-    # Init geocoder
-    geolocator = Nominatim(user_agent="chatgpt_geocode_script", timeout=10)
-    geocode = RateLimiter(
-        geolocator.geocode,
-        min_delay_seconds=1.2,
-        max_retries=3,
-        swallow_exceptions=True,
-    )
+    # Only the addresses this run actually needs are looked up in the cache
+    # db, so load time stays flat as the cache grows across datasets.
+    conn = _open_cache_db()
+    normalized = df[ADDRESS_COL].map(norm_addr)
+    rows_needing = df["Latitude"].isna() | df["Longitude"].isna()
+    wanted = sorted({a for a in normalized[rows_needing] if a})
+    cache_map = _load_cache_entries(conn, wanted)
+
+    # Geocode only unique, uncached addresses
+    need = [a for a in wanted if a not in cache_map]
+
+    # New results are appended to the cache db in small batches as they
+    # complete, so a crashed or interrupted run keeps everything geocoded so
+    # far; rows from earlier runs are never rewritten.
+    def flush(rows):
+        conn.executemany(
+            "INSERT OR REPLACE INTO geocache (query, lat, lng) VALUES (?, ?, ?)",
+            rows,
+        )
+        conn.commit()
 
     updated = 0
-
-    # ✅ Wrap loop in tqdm progress bar
-    for idx, row in tqdm(
-        df.iterrows(),
-        total=len(df),
-        desc="Geocoding",
-        ncols=100,
-    ):
-        addr_raw = row[ADDRESS_COL]
-        addr = norm_addr(addr_raw)
-        if not addr:
-            continue
-
-        # Skip if already filled
-        if pd.notna(row["Latitude"]) and pd.notna(row["Longitude"]):
-            continue
-
-        # Check cache
-        if addr in cache_map:
-            lat, lng = cache_map[addr]
-            df.at[idx, "Latitude"] = lat
-            df.at[idx, "Longitude"] = lng
-            continue
-
-        # Live geocode
-        loc = geocode(addr)
-        if loc:
-            lat, lng = loc.latitude, loc.longitude
-            df.at[idx, "Latitude"] = lat
-            df.at[idx, "Longitude"] = lng
+    if need:
+        for addr, (lat, lng) in _resolve_addresses(need, flush=flush).items():
             cache_map[addr] = (lat, lng)
             updated += 1
 
-    # Save cache
-    cache_df = pd.DataFrame(
-        [(k, v[0], v[1]) for k, v in cache_map.items()],
-        columns=["query", "lat", "lng"],
+    # Fill still-empty rows from the (now warm) cache with a single bulk
+    # assignment: start from the existing columns, overwrite by position where
+    # the cache has an answer, and write both columns back at once.
+    lats = pd.to_numeric(df["Latitude"], errors="coerce").to_numpy()
+    lngs = pd.to_numeric(df["Longitude"], errors="coerce").to_numpy()
+    replace = (np.isnan(lats) | np.isnan(lngs)) & normalized.isin(
+        cache_map.keys()
+    ).to_numpy()
+    cached_lat = normalized.map(
+        lambda a: cache_map.get(a, (np.nan, np.nan))[0]
+    ).astype(float).to_numpy()
+    cached_lng = normalized.map(
+        lambda a: cache_map.get(a, (np.nan, np.nan))[1]
+    ).astype(float).to_numpy()
+    df[["Latitude", "Longitude"]] = np.column_stack(
+        [
+            np.where(replace, cached_lat, lats),
+            np.where(replace, cached_lng, lngs),
+        ]
     )
-    try:
-        cache_df.to_parquet(CACHE_PATH, index=False)
-    except Exception:
-        cache_df.to_csv(CACHE_PATH.with_suffix(".csv"), index=False)
+
+    conn.close()
 
     print(f"✅ Geocoding complete. Updated {updated} rows.")
     return df
@@ -122,103 +269,134 @@ def geocode_addresses(df: pd.DataFrame) -> pd.DataFrame:
 
 # ----------------- Recategorizing ----------------- #
 
-def classify_category(text: str) -> str:
-    """
-    Heuristic / keyword-based classifier that maps a raw 'Category of Help'
-    string into one of 10 broad categories:
-
-    1. Food & Essential Needs
-    2. Housing & Shelter
-    3. Physical & General Health Care
-    4. Behavioral Health, Substance Use, & Crisis
-    5. Financial & Access Support
-    6. Employment, Training, & Education
-    7. Youth, Family, & General Support Services
-    8. Safety & Anti-Violence
-    9. Veteran Services
-    10. Other / Uncategorized
-    """
-    if pd.isna(text):
-        return "Other / Uncategorized"
-
-    s = str(text).strip().lower()
-
-    # --- 9. Veteran Services (highest priority) ---
-    if any(k in s for k in ["veteran", "va health", "va clinic"]):
-        return "Veteran Services"
-
-    # --- 8. Safety & Anti-Violence ---
-    if any(k in s for k in [
+# Keyword lists per broad category, in match-priority order (Veteran Services
+# is checked first, Youth/Family last; anything unmatched is Other).
+_CATEGORY_KEYWORDS = [
+    ("Veteran Services", [
+        "veteran", "va health", "va clinic",
+    ]),
+    ("Safety & Anti-Violence", [
         "domestic violence", "dv", "sexual assault", "intimate partner",
-        "safe house", "violence", "trafficking"
-    ]):
-        return "Safety & Anti-Violence"
-
-    # --- 4. Behavioral Health, Substance Use, & Crisis ---
-    if any(k in s for k in [
+        "safe house", "violence", "trafficking",
+    ]),
+    ("Behavioral Health, Substance Use, & Crisis", [
         "behavioral health", "mental health", "psychiat", "counseling",
         "crisis", "hotline", "suicide", "harm reduction", "overdose",
-        "substance use", "addiction", "recovery", "mat program", "peer support"
-    ]):
-        return "Behavioral Health, Substance Use, & Crisis"
-
-    # --- 3. Physical & General Health Care ---
-    if any(k in s for k in [
+        "substance use", "addiction", "recovery", "mat program", "peer support",
+    ]),
+    ("Physical & General Health Care", [
         "healthcare", "health care", "health center", "clinic", "medical",
         "hospital", "fqh", "fqhc", "sliding scale", "charity care",
-        "vision", "dental", "women/lgbtq", "lgbtq+ health"
-    ]):
-        return "Physical & General Health Care"
-
-    # --- 2. Housing & Shelter ---
-    if any(k in s for k in [
+        "vision", "dental", "women/lgbtq", "lgbtq+ health",
+    ]),
+    ("Housing & Shelter", [
         "shelter", "housing", "supportive housing", "emergency shelter",
         "transitional", "safe haven", "overnight", "rapid rehousing",
-        "tenant", "landlord", "homeownership", "home repair"
-    ]):
-        return "Housing & Shelter"
-
-    # --- 1. Food & Essential Needs ---
-    if any(k in s for k in [
+        "tenant", "landlord", "homeownership", "home repair",
+    ]),
+    ("Food & Essential Needs", [
         "food", "pantry", "soup kitchen", "meal", "meals",
         "groceries", "grocery", "clothing", "clothes",
         "basic needs", "essentials", "household goods",
-        "day center", "day resource"
-    ]):
-        return "Food & Essential Needs"
-
-    # --- 5. Financial & Access Support ---
-    if any(k in s for k in [
+        "day center", "day resource",
+    ]),
+    ("Financial & Access Support", [
         "benefits", "assistance program", "financial assistance",
         "cash", "income support", "tax credit", "tax help",
         "utility assistance", "utilities", "electric", "gas bill",
         "water bill", "communications discount", "lifeline",
-        "digital access", "internet", "broadband"
-    ]):
-        return "Financial & Access Support"
-
-    # --- 6. Employment, Training, & Education ---
-    if any(k in s for k in [
+        "digital access", "internet", "broadband",
+    ]),
+    ("Employment, Training, & Education", [
         "employment", "job", "jobs", "career", "workforce",
         "training", "job training", "vocational", "rehabilitation",
         "apprentice", "internship", "resume", "interview skills",
         "youth employment", "summer jobs", "education/employment",
-        "ged", "adult education"
-    ]):
-        return "Employment, Training, & Education"
-
-    # --- 7. Youth, Family, & General Support Services ---
-    if any(k in s for k in [
+        "ged", "adult education",
+    ]),
+    ("Youth, Family, & General Support Services", [
         "youth", "teen", "family", "child", "children",
         "early childhood", "family support", "parenting",
         "mentor", "drop-in", "advocacy",
         "community space", "community center",
-        "culture & food access", "community services"
-    ]):
-        return "Youth, Family, & General Support Services"
+        "culture & food access", "community services",
+    ]),
+]
+
+OTHER_CATEGORY = "Other / Uncategorized"
+
+# All keywords folded into one alternation with a named group per category
+# (c0 = highest priority); re.escape keeps the plain-substring semantics of
+# the old `any(k in s for k in ...)` checks. The lookahead keeps matches
+# zero-width so overlapping keywords (e.g. "dv" inside "advocacy") are all
+# seen, like independent `in` probes were.
+_COMBINED_PATTERN = re.compile(
+    "(?=(?:"
+    + "|".join(
+        "(?P<c{}>{})".format(i, "|".join(re.escape(k) for k in kws))
+        for i, (_cat, kws) in enumerate(_CATEGORY_KEYWORDS)
+    )
+    + "))",
+    re.IGNORECASE,
+)
+
+# With pyahocorasick installed, all ~100 keywords are matched in one linear
+# pass over each string instead of one scan per category.
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+_CATEGORY_AUTOMATON = None
+if ahocorasick is not None:
+    _CATEGORY_AUTOMATON = ahocorasick.Automaton()
+    for _priority, (_cat, _kws) in enumerate(_CATEGORY_KEYWORDS):
+        for _kw in _kws:
+            # First occurrence wins, mirroring the priority order above.
+            if not _CATEGORY_AUTOMATON.exists(_kw):
+                _CATEGORY_AUTOMATON.add_word(_kw, (_priority, _cat))
+    _CATEGORY_AUTOMATON.make_automaton()
+
+
+def _classify_normalized(s: str) -> str:
+    """Classify an already stripped/lowercased category string."""
+    if _CATEGORY_AUTOMATON is not None:
+        best = min(
+            (val for _, val in _CATEGORY_AUTOMATON.iter(s)), default=None
+        )
+        return best[1] if best is not None else OTHER_CATEGORY
+    # One C-level traversal; keep the highest-priority group that fired so
+    # priority still beats string position, as in the old if-chain.
+    best = None
+    for m in _COMBINED_PATTERN.finditer(s):
+        i = int(m.lastgroup[1:])
+        if best is None or i < best:
+            best = i
+            if best == 0:
+                break
+    return _CATEGORY_KEYWORDS[best][0] if best is not None else OTHER_CATEGORY
 
-    # Fallback
-    return "Other / Uncategorized"
+
+def classify_category(text: str) -> str:
+    """
+    Heuristic / keyword-based classifier that maps a raw 'Category of Help'
+    string into one of 10 broad categories:
+
+    1. Food & Essential Needs
+    2. Housing & Shelter
+    3. Physical & General Health Care
+    4. Behavioral Health, Substance Use, & Crisis
+    5. Financial & Access Support
+    6. Employment, Training, & Education
+    7. Youth, Family, & General Support Services
+    8. Safety & Anti-Violence
+    9. Veteran Services
+    10. Other / Uncategorized
+    """
+    if pd.isna(text):
+        return OTHER_CATEGORY
+
+    return _classify_normalized(str(text).strip().lower())
 
 
 def recategorize_categories(df: pd.DataFrame) -> pd.DataFrame:
@@ -232,9 +410,20 @@ def recategorize_categories(df: pd.DataFrame) -> pd.DataFrame:
     if backup_col not in df.columns:
         df[backup_col] = df[CATEGORY_COL]
 
-    tqdm.pandas(desc="Recategorizing")
-
-    df[CATEGORY_COL] = df[CATEGORY_COL].progress_apply(classify_category)
+    # Factorize so classification only runs over the unique raw strings
+    # (U << N rows), then fan the labels back out by code. The automaton (or
+    # the regex fallback) keeps the same priority order as the old if-chain.
+    codes, uniques = pd.factorize(df[CATEGORY_COL].astype(str))
+    # Normalize once up front (same strip/lower classify_category applies
+    # per call) so the keyword scans run against clean text.
+    u = pd.Series(uniques).str.strip().str.lower()
+    labels = np.array([_classify_normalized(x) for x in u], dtype=object)
+    # ~10 labels repeated over every row: Categorical stores int8 codes into a
+    # small categories index instead of one Python string object per cell.
+    df[CATEGORY_COL] = pd.Categorical(
+        labels[codes],
+        categories=[cat for cat, _ in _CATEGORY_KEYWORDS] + [OTHER_CATEGORY],
+    )
 
     print("✅ Recategorization complete. Each row now has one of 10 categories.")
     return df
@@ -262,6 +451,15 @@ def main():
 
     # Save output
     df.to_excel(OUTPUT_PATH, index=False)
+
+    # Parquet companion for the Django view — far faster to read than xlsx.
+    parquet_path = OUTPUT_PATH.with_suffix(".parquet")
+    try:
+        df.to_parquet(parquet_path, index=False)
+        print(f"✅ Wrote parquet companion to: {parquet_path}")
+    except Exception as e:
+        print(f"⚠️ Could not write parquet companion ({e}). The view will fall back to the xlsx.")
+
     print(f"\n✅ Done. Wrote processed file to: {OUTPUT_PATH}")
 
 
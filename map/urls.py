@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
-from .views import resources_map, home_page, questionnaire_page, actions_page, about_page, ping
+from .views import resources_map, resources_json, home_page, questionnaire_page, actions_page, about_page, ping
 
 urlpatterns = [
     path("",home_page, name = "homepage"),
@@ -8,6 +8,7 @@ urlpatterns = [
     path("about/", about_page, name="about"),
     path("questionnaire/", questionnaire_page, name="questionnaire"),
     path("ping/", ping),
-    path("map/", resources_map, name="resources_map")
-    
+    path("map/", resources_map, name="resources_map"),
+    path("map/resources.json", resources_json, name="resources_json")
+
 ]
@@ -1,29 +1,150 @@
+from collections import defaultdict
+from datetime import datetime, timezone
 from pathlib import Path
+import json
 import math
+import threading
 
 from django.conf import settings
 from django.http import HttpResponse
 from django.shortcuts import render
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
 
 
 # Path to your Excel file:  BmoreLine/input_data/1109 Upload_geocoded.xlsx
 XLSX_PATH = Path(settings.BASE_DIR) /"input_data" / "03232026_Upload_geocoded.xlsx"
 
+# xlsx_processor.py writes a Parquet companion next to the geocoded xlsx;
+# reading it is ~100x faster than parsing the xlsx, so prefer it when present.
+PARQUET_PATH = XLSX_PATH.with_suffix(".parquet")
+
+# In-process cache for the parsed spreadsheet, keyed on the source file and
+# its mtime so a redeployed/replaced file is picked up without a restart.
+_RESOURCES_CACHE = {
+    "key": None,
+    "resources": None,
+    "diag": None,
+    "json": None,
+    "indexes": None,
+}
+_RESOURCES_LOCK = threading.Lock()
+
+
+def _data_path():
+    """The file the resource list is loaded from (parquet if available)."""
+    return PARQUET_PATH if PARQUET_PATH.exists() else XLSX_PATH
+
+
+# Accepted spellings for the yes/no flag columns; anything else is None
+# (unknown / not filled).
+_BOOL_MAP = {
+    "yes": True,
+    "y": True,
+    "true": True,
+    "1": True,
+    "no": False,
+    "n": False,
+    "false": False,
+    "0": False,
+}
+
+# Every header the parser may consult (any spelling variant). Parquet reads
+# are projected onto whichever of these the file actually has, so unused
+# columns are never read off disk.
+_NEEDED_HEADERS = (
+    "ID", "id",
+    "Name of Service", "Name",
+    "Address", "Phone Number", "Phone", "Email",
+    "Category of Help", "Cateogry of Help", "Cateogry of Help (Original)", "Category",
+    "Consolidated Category", "Consolidated Tag Category",
+    "Tag_List", "Taglist", "Tag List",
+    "Description", "Restrictions of Service", "Days of Service",
+    "link to site", "Website", "Link",
+    "Legitimate place?", "Legitimate place ?",
+    "confirmed", "called + confirmed?", "called + confirmed ?",
+    "Reliability Rate 1-10", "Reliability Rate 1–10", "Reliability",
+    "avg_reliability_ratings", "Average Reliability Ratings",
+    "Condensed Reliability Description",
+    "Call experience", "Unnamed: 18",
+    "Latitude", "Lat", "Longitude", "Lng", "Long",
+) + tuple(f"Tag_{i:02d}" for i in range(1, 26))
+
+
+def _norm_header(s):
+    """Whitespace/case-insensitive key used to match header spellings."""
+    return " ".join(str(s).strip().lower().split()) if s is not None else ""
+
+
+_NEEDED_NORMALIZED = frozenset(_norm_header(n) for n in _NEEDED_HEADERS)
 
-def _to_float(x):
-    """Safe float conversion; returns None if not a usable number."""
+
+def _load_resources_from_xlsx():
+    """
+    Cached front door for `_parse_resources_from_xlsx`.
+
+    Parsing the workbook costs hundreds of ms per call, so keep the parsed
+    list in memory and only re-parse when the file's mtime changes.
+    """
+    path = _data_path()
     try:
-        if x is None:
-            return None
-        f = float(x)
-        if math.isnan(f):
-            return None
-        return f
-    except Exception:
-        return None
+        key = (str(path), path.stat().st_mtime)
+    except OSError:
+        key = None
 
+    with _RESOURCES_LOCK:
+        if key is not None and _RESOURCES_CACHE["key"] == key:
+            return _RESOURCES_CACHE["resources"], _RESOURCES_CACHE["diag"]
 
-def _load_resources_from_xlsx():
+        resources, diag = _parse_resources_from_xlsx(path)
+
+        # Only cache clean parses; errors should surface again on retry.
+        if key is not None and not diag["errors"]:
+            _RESOURCES_CACHE["key"] = key
+            _RESOURCES_CACHE["resources"] = resources
+            _RESOURCES_CACHE["diag"] = diag
+            _RESOURCES_CACHE["json"] = None  # re-serialized lazily
+            _RESOURCES_CACHE["indexes"] = None  # rebuilt lazily
+
+        return resources, diag
+
+
+def _resource_indexes():
+    """Category and 1-degree-tile indexes over the cached resource list."""
+    resources, _diag = _load_resources_from_xlsx()
+    with _RESOURCES_LOCK:
+        if (
+            _RESOURCES_CACHE["resources"] is resources
+            and _RESOURCES_CACHE["indexes"] is not None
+        ):
+            return _RESOURCES_CACHE["indexes"]
+        by_category = defaultdict(list)
+        by_tile = defaultdict(list)
+        for r in resources:
+            by_category[r["category"]].append(r)
+            by_tile[(math.floor(r["lat"]), math.floor(r["lng"]))].append(r)
+        indexes = {"by_category": dict(by_category), "by_tile": dict(by_tile)}
+        if _RESOURCES_CACHE["resources"] is resources:
+            _RESOURCES_CACHE["indexes"] = indexes
+        return indexes
+
+
+def _resources_json_bytes():
+    """The resource list as compact JSON bytes, serialized once per dataset."""
+    resources, _diag = _load_resources_from_xlsx()
+    with _RESOURCES_LOCK:
+        if (
+            _RESOURCES_CACHE["resources"] is resources
+            and _RESOURCES_CACHE["json"] is not None
+        ):
+            return _RESOURCES_CACHE["json"]
+        blob = json.dumps(resources, separators=(",", ":")).encode("utf-8")
+        if _RESOURCES_CACHE["resources"] is resources:
+            _RESOURCES_CACHE["json"] = blob
+        return blob
+
+
+def _parse_resources_from_xlsx(path=XLSX_PATH):
     """
     Load resources from the Excel file and return (resources_list, diagnostics_dict).
 
@@ -48,8 +169,8 @@ def _load_resources_from_xlsx():
     """
 
     diag = {
-        "path": str(XLSX_PATH),
-        "exists": XLSX_PATH.exists(),
+        "path": str(path),
+        "exists": path.exists(),
         "sheet_title": None,
         "headers": [],
         "parsed_rows": 0,
@@ -67,58 +188,83 @@ def _load_resources_from_xlsx():
 
     resources = []
 
-    if not XLSX_PATH.exists():
+    if not path.exists():
         diag["errors"].append("File not found")
         return resources, diag
 
     try:
-        from openpyxl import load_workbook
+        import numpy as np
+        import pandas as pd
     except ImportError:
-        diag["errors"].append("openpyxl not installed (pip install openpyxl)")
+        diag["errors"].append("pandas not installed (pip install pandas openpyxl)")
         return resources, diag
 
     try:
-        wb = load_workbook(filename=str(XLSX_PATH), data_only=True)
-        ws = wb.active
-        diag["sheet_title"] = ws.title
-
-        # Header row
-        header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True))
-        headers = [h or "" for h in header_row]
+        if path.suffix == ".parquet":
+            # Project the read onto the columns the parser consumes; parquet
+            # pushes the selection down so skipped columns are never decoded.
+            import pyarrow.parquet as pq
+
+            cols = [
+                c
+                for c in pq.read_schema(path).names
+                if _norm_header(c) in _NEEDED_NORMALIZED
+            ]
+            df = pd.read_parquet(path, columns=cols)
+        else:
+            xf = pd.ExcelFile(path, engine="openpyxl")
+            sheet = xf.sheet_names[0]
+            # dtype=object keeps each cell's native type (ints stay ints) so
+            # text fields stringify the same way the old openpyxl loader did.
+            df = xf.parse(sheet, dtype=object)
+            diag["sheet_title"] = sheet
+
+        headers = [str(h) for h in df.columns]
         diag["headers"] = headers
         print("Detected headers:", headers)
 
-        def norm(s):
-            return " ".join(str(s).strip().lower().split()) if s is not None else ""
+        header_map = {_norm_header(h): h for h in df.columns}
 
-        header_map = {norm(h): idx for idx, h in enumerate(headers)}
+        empty = pd.Series("", index=df.index)
 
-        def grab(row, *names, default=""):
-            """Pull a cell by any of the given header names."""
+        def raw_col(*names):
+            """Combine the given candidate columns; first non-null value wins."""
+            out = None
             for n in names:
-                idx = header_map.get(norm(n))
-                if idx is not None and idx < len(row):
-                    val = row[idx]
-                    if val is not None:
-                        return val
-            return default
+                c = header_map.get(_norm_header(n))
+                if c is None:
+                    continue
+                out = df[c] if out is None else out.combine_first(df[c])
+            return out
+
+        def text_col(*names):
+            """Stripped string Series for the given header names ('' where blank)."""
+            s = raw_col(*names)
+            if s is None:
+                return empty
+            if pd.api.types.is_float_dtype(s):
+                # Parquet types whole-number columns as float; strip the ".0"
+                # so they stringify the way openpyxl ints did.
+                return s.astype(str).str.replace(r"\.0$", "", regex=True).mask(
+                    s.isna(), ""
+                ).str.strip()
+            # mask() rather than fillna() so Categorical columns (e.g. the
+            # recategorized category column in parquet) don't reject "".
+            return s.astype(str).mask(s.isna(), "").str.strip()
+
+        def num_col(*names):
+            """Float Series for the given header names (NaN where unparsable)."""
+            s = raw_col(*names)
+            if s is None:
+                return pd.Series(np.nan, index=df.index)
+            return pd.to_numeric(s, errors="coerce")
 
         def first_matching_header(*names):
             for n in names:
-                if norm(n) in header_map:
+                if _norm_header(n) in header_map:
                     return n
             return None
 
-        def to_bool_flag(v):
-            if v is None:
-                return None
-            s = str(v).strip().lower()
-            if s in {"yes", "y", "true", "1"}:
-                return True
-            if s in {"no", "n", "false", "0"}:
-                return False
-            return None  # unknown / not filled
-
         def is_truthy_tag(v):
             if v is None:
                 return False
@@ -158,9 +304,8 @@ def _load_resources_from_xlsx():
         else:
             print("Category column selected:", False)
 
-        consolidated_categories = set()
         tag_columns = [f"Tag_{i:02d}" for i in range(1, 26)]
-        tag_columns_found = [c for c in tag_columns if norm(c) in header_map]
+        tag_columns_found = [c for c in tag_columns if _norm_header(c) in header_map]
         diag["tag_columns_found"] = tag_columns_found
         if tag_columns_found:
             print("Tag columns found:", tag_columns_found)
@@ -168,131 +313,124 @@ def _load_resources_from_xlsx():
             print("Tag columns found:", False)
         tag_counts = {c: 0 for c in tag_columns_found}
 
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            name = str(grab(row, "Name of Service", "Name", default="")).strip()
-            address = str(grab(row, "Address", default="")).strip()
-            phone = str(grab(row, "Phone Number", "Phone", default="")).strip()
-            email = str(grab(row, "Email", default="")).strip()
-            category = str(
-                grab(
-                    row,
-                    "Category of Help",
-                    "Cateogry of Help",
-                    "Cateogry of Help (Original)",
-                    "Category",
-                    default="",
-                )
-            ).strip() or "Uncategorized"
-            consolidated_value = str(
-                grab(
-                    row,
-                    "Consolidated Category",
-                    "Consolidated Tag Category",
-                    default="",
-                )
-            ).strip()
-            if consolidated_value:
-                consolidated_categories.add(consolidated_value)
-            taglist_header = first_matching_header("Tag_List", "Taglist", "Tag List")
-            if taglist_header and diag.get("taglist_header") is None:
-                diag["taglist_header"] = taglist_header
-                print("Tag list column selected:", taglist_header)
-
-            taglist_value = grab(row, "Tag_List", "Taglist", "Tag List", default="")
-            tags = parse_tag_list(taglist_value)
-            if not tags:
-                for col in tag_columns_found:
-                    val = grab(row, col, default=None)
-                    if is_truthy_tag(val):
-                        tags.append(col)
-                        tag_counts[col] += 1
-            desc = str(grab(row, "Description", default="")).strip()
-            restrictions = str(grab(row, "Restrictions of Service", default="")).strip()
-            days = str(grab(row, "Days of Service", default="")).strip()
-            link = str(
-                grab(row, "link to site", "Website", "Link", default="")
-            ).strip()
-
-            legit_raw = grab(row, "Legitimate place?", "Legitimate place ?", default="")
-            confirmed_raw = grab(
-                row,
-                "confirmed",
-                "called + confirmed?",
-                "called + confirmed ?",
-                default="",
-            )
+        taglist_header = first_matching_header("Tag_List", "Taglist", "Tag List")
+        if taglist_header:
+            diag["taglist_header"] = taglist_header
+            print("Tag list column selected:", taglist_header)
 
-            reliability_raw = str(
-                grab(row, "Reliability Rate 1-10", "Reliability Rate 1–10", "Reliability", default="")
-            ).strip()
-            avg_reliability_ratings_raw = str(
-                grab(
-                    row,
-                    "avg_reliability_ratings",
-                    "Average Reliability Ratings",
-                    default="",
-                )
-            ).strip()
-            avg_reliability_ratings = (
-                avg_reliability_ratings_raw
-                if avg_reliability_ratings_raw.lower() not in {"", "nan", "none"}
-                else "na"
-            )
-            condensed_reliability_description = str(
-                grab(row, "Condensed Reliability Description", default="")
-            ).strip()
-            reliability = (
-                avg_reliability_ratings
-                if avg_reliability_ratings != "na"
-                else reliability_raw if reliability_raw not in {"", "nan", "none"} else "na"
+        name = text_col("Name of Service", "Name")
+        category = text_col(
+            "Category of Help",
+            "Cateogry of Help",
+            "Cateogry of Help (Original)",
+            "Category",
+        )
+        category = category.where(category != "", "Uncategorized")
+
+        consolidated = text_col("Consolidated Category", "Consolidated Tag Category")
+        consolidated_categories = set(consolidated[consolidated != ""].unique())
+
+        tags = text_col("Tag_List", "Taglist", "Tag List").map(parse_tag_list)
+        if tag_columns_found:
+            # Tag_XX flag columns are only consulted for rows without a Tag_List.
+            no_taglist = (tags.str.len() == 0).to_numpy()
+            flag_masks = []
+            for col in tag_columns_found:
+                mask = df[header_map[_norm_header(col)]].map(is_truthy_tag).to_numpy() & no_taglist
+                tag_counts[col] = int(mask.sum())
+                flag_masks.append(mask)
+            flag_matrix = np.column_stack(flag_masks)
+            fallback = [
+                [col for col, hit in zip(tag_columns_found, row) if hit]
+                for row in flag_matrix
+            ]
+            tags = pd.Series(
+                [t if t else f for t, f in zip(tags, fallback)], index=df.index
             )
 
-            call_exp = str(grab(row, "Call experience", default="")).strip()
-            extra = str(grab(row, "Unnamed: 18", default="")).strip()
-            call_notes = " | ".join([x for x in [call_exp, extra] if x])
+        legit = text_col("Legitimate place?", "Legitimate place ?").str.lower().map(
+            _BOOL_MAP.get
+        )
+        confirmed = text_col(
+            "confirmed", "called + confirmed?", "called + confirmed ?"
+        ).str.lower().map(_BOOL_MAP.get)
 
-            lat_raw = grab(row, "Latitude", "Lat", default=None)
-            lng_raw = grab(row, "Longitude", "Lng", "Long", default=None)
+        reliability_raw = text_col(
+            "Reliability Rate 1-10", "Reliability Rate 1–10", "Reliability"
+        )
+        avg_reliability_ratings = text_col(
+            "avg_reliability_ratings", "Average Reliability Ratings"
+        )
+        avg_reliability_ratings = avg_reliability_ratings.where(
+            ~avg_reliability_ratings.str.lower().isin(["", "nan", "none"]), "na"
+        )
+        reliability = avg_reliability_ratings.where(
+            avg_reliability_ratings != "na",
+            reliability_raw.where(~reliability_raw.isin(["", "nan", "none"]), "na"),
+        )
 
-            lat = _to_float(lat_raw)
-            lng = _to_float(lng_raw)
+        call_exp = text_col("Call experience")
+        extra = text_col("Unnamed: 18")
+        call_notes = pd.Series(
+            np.where(
+                (call_exp != "") & (extra != ""),
+                call_exp + " | " + extra,
+                call_exp + extra,
+            ),
+            index=df.index,
+        )
 
-            # Skip rows without usable coordinates
-            if lat is None or lng is None:
-                diag["skipped_no_coords"] += 1
-                continue
+        lat = num_col("Latitude", "Lat")
+        lng = num_col("Longitude", "Lng", "Long")
 
-            # Filter obviously invalid coordinates
-            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
-                diag["bad_latlng"] += 1
-                continue
+        # Skip rows without usable coordinates, filter obviously invalid ones
+        has_coords = lat.notna() & lng.notna()
+        in_range = lat.between(-90, 90) & lng.between(-180, 180)
+        diag["skipped_no_coords"] = int((~has_coords).sum())
+        diag["bad_latlng"] = int((has_coords & ~in_range).sum())
 
-            rid = grab(row, "ID", "id", default=None)
-            if rid is None or str(rid).strip() == "":
-                rid = len(resources) + 1
+        rid = raw_col("ID", "id")
+        if rid is None:
+            rid = pd.Series(np.nan, index=df.index)
 
-            res = {
+        out = pd.DataFrame(
+            {
                 "id": rid,
-                "name": name or "Unnamed resource",
+                "name": name.where(name != "", "Unnamed resource"),
                 "lat": lat,
                 "lng": lng,
                 "category": category,
-                "phone_number": phone,
-                "address": address,
-                "email": email,
-                "description": desc,
-                "restrictions": restrictions,
-                "days": days,
-                "link": link,
-                "legit": to_bool_flag(legit_raw),
-                "confirmed": to_bool_flag(confirmed_raw),
+                "phone_number": text_col("Phone Number", "Phone"),
+                "address": text_col("Address"),
+                "email": text_col("Email"),
+                "description": text_col("Description"),
+                "restrictions": text_col("Restrictions of Service"),
+                "days": text_col("Days of Service"),
+                "link": text_col("link to site", "Website", "Link"),
+                "legit": legit,
+                "confirmed": confirmed,
                 "reliability": reliability,
                 "avg_reliability_ratings": avg_reliability_ratings,
-                "condensed_reliability_description": condensed_reliability_description,
+                "condensed_reliability_description": text_col(
+                    "Condensed Reliability Description"
+                ),
                 "call_notes": call_notes,
                 "tags": tags,
             }
-            resources.append(res)
+        )[(has_coords & in_range).to_numpy()]
+
+        # Default missing IDs to the row's 1-based position among kept rows,
+        # and unbox integral floats so IDs round-trip like openpyxl ints did.
+        missing_id = (
+            out["id"].isna() | (out["id"].astype(str).str.strip() == "")
+        ).to_numpy()
+        out["id"] = out["id"].astype(object)
+        out.loc[missing_id, "id"] = np.arange(1, len(out) + 1)[missing_id]
+        out["id"] = out["id"].map(
+            lambda v: int(v) if isinstance(v, float) and v.is_integer() else v
+        )
+
+        resources = out.to_dict(orient="records")
 
         diag["parsed_rows"] = len(resources)
         diag["consolidated_categories"] = sorted(consolidated_categories)
@@ -306,6 +444,16 @@ def _load_resources_from_xlsx():
     return resources, diag
 
 
+def _data_last_modified(request, *args, **kwargs):
+    """Last-Modified for the map views: the data file's mtime."""
+    try:
+        return datetime.fromtimestamp(_data_path().stat().st_mtime, tz=timezone.utc)
+    except OSError:
+        return None
+
+
+@condition(last_modified_func=_data_last_modified)
+@gzip_page
 def resources_map(request):
     """Main map view – loads data from Excel and passes it into the template."""
     resources, diag = _load_resources_from_xlsx()
@@ -330,14 +478,73 @@ def resources_map(request):
             .replace("\n", "<br>")
         )
 
-    # Normal map render
+    # Normal map render; the page fetches the resource list from
+    # resources_json so the HTML shell stays small and cacheable.
     return render(
         request,
         "map_home.html",
-        {"resources": resources, "consolidated_categories": consolidated_categories},
+        {"consolidated_categories": consolidated_categories},
     )
 
 
+@condition(last_modified_func=_data_last_modified)
+@gzip_page
+def resources_json(request):
+    """
+    Resource list as JSON for the map page (serialized once per dataset).
+
+    Optional filters compose from in-memory indexes instead of scanning the
+    full list:
+      ?cat=<category>                         exact category match
+      ?bbox=<min_lng>,<min_lat>,<max_lng>,<max_lat>
+                                              Leaflet toBBoxString() order
+    """
+    cat = request.GET.get("cat")
+    bbox = request.GET.get("bbox")
+
+    if cat is None and bbox is None:
+        blob = _resources_json_bytes()
+    else:
+        indexes = _resource_indexes()
+        matched = indexes["by_category"].get(cat, []) if cat is not None else None
+        if bbox is not None:
+            try:
+                min_lng, min_lat, max_lng, max_lat = (
+                    float(p) for p in bbox.split(",")
+                )
+            except ValueError:
+                return HttpResponse("Invalid bbox", status=400)
+            if not all(
+                math.isfinite(v) for v in (min_lng, min_lat, max_lng, max_lat)
+            ):
+                return HttpResponse("Invalid bbox", status=400)
+            # Clamp the tile scan to the valid lat/lng domain so an oversized
+            # bbox can't turn the loop below into a denial of service.
+            lat_lo = max(math.floor(min_lat), -90)
+            lat_hi = min(math.floor(max_lat), 90)
+            lng_lo = max(math.floor(min_lng), -180)
+            lng_hi = min(math.floor(max_lng), 180)
+            candidates = []
+            for tile_lat in range(lat_lo, lat_hi + 1):
+                for tile_lng in range(lng_lo, lng_hi + 1):
+                    candidates.extend(indexes["by_tile"].get((tile_lat, tile_lng), []))
+            in_box = [
+                r
+                for r in candidates
+                if min_lat <= r["lat"] <= max_lat and min_lng <= r["lng"] <= max_lng
+            ]
+            if matched is None:
+                matched = in_box
+            else:
+                box_ids = {id(r) for r in in_box}
+                matched = [r for r in matched if id(r) in box_ids]
+        blob = json.dumps(matched, separators=(",", ":")).encode("utf-8")
+
+    response = HttpResponse(blob, content_type="application/json")
+    response["Cache-Control"] = "public, max-age=300"
+    return response
+
+
 def _derive_tags_from_answers(answers):
     need = set()
     scenario = set()